@@ -6,8 +6,6 @@ import time
 import random
 from datetime import datetime
 from urllib.parse import urlparse
-import requests
-from bs4 import BeautifulSoup
 import subprocess
 import os
 import re
@@ -25,6 +23,9 @@ PROXY_SOURCES = [
 TEST_URL = "http://www.baidu.com"
 TEST_TIMEOUT = 10  # 超时时间（秒）
 
+# 支持的代理链接协议前缀
+PROXY_SCHEMES = ('ss://', 'vmess://', 'vless://', 'trojan://')
+
 # Clash配置模板
 CLASH_TEMPLATE = {
     "port": 7890,
@@ -87,7 +88,7 @@ async def fetch_proxies(session, url):
                 content = await response.text()
 
                 # 处理YAML格式
-                if url.endswith('.yaml') or url.endswith('.yml'):
+                if url.endswith(('.yaml', '.yml')):
                     try:
                         data = yaml.safe_load(content)
                         if 'proxies' in data:
@@ -110,13 +111,34 @@ async def fetch_proxies(session, url):
                     lines = content.split('\n')
                     for line in lines:
                         line = line.strip()
-                        if line.startswith('ss://') or line.startswith('vmess://') or line.startswith('vless://') or line.startswith('trojan://'):
+                        if line.startswith(PROXY_SCHEMES):
                             proxies.append(line)
     except Exception as e:
         print(f"获取代理失败: {url}, 错误: {str(e)}")
 
     return proxies
 
+def proxy_key(proxy):
+    """生成用于去重的代理标识"""
+    if isinstance(proxy, dict):
+        # 除名称外的全部字段都参与比较：同一server:port上uuid、password、ws-opts等不同的节点是不同节点，
+        # 只有名称不同的节点才视为重复
+        return json.dumps({k: v for k, v in proxy.items() if k != 'name'}, sort_keys=True, default=str)
+    return proxy
+
+def save_config(config, path='subscription.yml'):
+    """保存Clash配置，内容未变化时跳过写入"""
+    content = yaml.dump(config, default_flow_style=False, allow_unicode=True)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                print("订阅配置未变化，跳过写入")
+                return False
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
 async def test_proxy_speed(session, proxy):
     """测试代理速度"""
     start_time = time.time()
@@ -164,27 +186,46 @@ async def main():
     """主函数"""
     print("开始爬取代理节点...")
 
-    all_proxies = []
+    source_proxies = [[] for _ in PROXY_SOURCES]
+    test_tasks = {}
     async with aiohttp.ClientSession() as session:
-        # 从各个源获取代理
-        tasks = [fetch_proxies(session, url) for url in PROXY_SOURCES]
-        results = await asyncio.gather(*tasks)
+        async def fetch_indexed(index, url):
+            return index, await fetch_proxies(session, url)
+
+        # 从各个源获取代理，每个源返回后立即开始测速，不必等待最慢的源
+        tasks = [fetch_indexed(index, url) for index, url in enumerate(PROXY_SOURCES)]
+        for future in asyncio.as_completed(tasks):
+            index, proxies = await future
+            source_proxies[index] = proxies
+            for proxy in proxies:
+                # 相同节点只测速一次
+                key = proxy_key(proxy)
+                if key not in test_tasks:
+                    test_tasks[key] = asyncio.ensure_future(test_proxy_speed(session, proxy))
 
-        for proxies in results:
-            all_proxies.extend(proxies)
+        # 按PROXY_SOURCES的顺序去重，重复节点保留优先级更高的源中的条目，与各源的返回先后无关
+        all_proxies = {}
+        for proxies in source_proxies:
+            for proxy in proxies:
+                all_proxies.setdefault(proxy_key(proxy), proxy)
 
         print(f"总共获取到 {len(all_proxies)} 个代理节点")
 
         if not all_proxies:
             print("未获取到任何代理节点，使用默认配置")
-            with open('subscription.yml', 'w', encoding='utf-8') as f:
-                yaml.dump(CLASH_TEMPLATE, f, default_flow_style=False, allow_unicode=True)
+            save_config(CLASH_TEMPLATE)
             return
 
-        # 测试代理速度
-        print("开始测试代理速度...")
-        test_tasks = [test_proxy_speed(session, proxy) for proxy in all_proxies]
-        test_results = await asyncio.gather(*test_tasks)
+        # 等待代理测速完成
+        print("等待代理测速完成...")
+        results_by_key = dict(zip(test_tasks, await asyncio.gather(*test_tasks.values())))
+        test_results = []
+        for key, proxy in all_proxies.items():
+            result = results_by_key[key]
+            if isinstance(proxy, dict):
+                # 测速的可能是先返回的源中的同一节点，这里换回优先源中的条目和名称
+                result = {**result, 'proxy': proxy, 'name': proxy.get('name', '')}
+            test_results.append(result)
 
         # 筛选有效代理并按速度排序
         valid_proxies = [r for r in test_results if r['valid']]
@@ -202,15 +243,15 @@ async def main():
 
         for result in fastest_proxies:
             proxy = result['proxy']
+            # 测速结果中已包含节点名称，无需重新解析
+            proxy_name = result['name']
+            proxy_names.append(proxy_name)
             if isinstance(proxy, dict):
                 # 已经是Clash格式的代理
                 clash_proxies.append(proxy)
-                proxy_names.append(proxy.get('name', ''))
             else:
                 # URL格式的代理，需要转换为Clash格式
                 # 这里只是示例，实际需要根据不同协议进行转换
-                proxy_name = result['name']
-                proxy_names.append(proxy_name)
 
                 # 简单示例，实际需要根据协议类型解析
                 if proxy.startswith('ss://'):
@@ -263,8 +304,7 @@ async def main():
         }
 
         # 保存配置
-        with open('subscription.yml', 'w', encoding='utf-8') as f:
-            yaml.dump(clash_config, f, default_flow_style=False, allow_unicode=True)
+        save_config(clash_config)
 
         print(f"已生成Clash订阅配置，包含 {len(clash_proxies)} 个代理节点")
 